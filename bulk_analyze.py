@@ -0,0 +1,203 @@
+"""
+이미지 디렉터리/목록 파일 일괄 분석 CLI
+
+사용 예:
+    python bulk_analyze.py photos/ --output results/ --batch-size 64 --workers 8
+    python bulk_analyze.py manifest.txt --output results/ --weights best_model.pt
+
+결과는 output 디렉터리에 part-00000.parquet 형식의 shard로 저장되며,
+중단 후 같은 명령을 다시 실행하면 이미 저장된 이미지(디코딩 오류 포함)는 건너뜁니다.
+--retry-errors 사용 시 오류 이미지를 다시 분석하며, 이때 같은 경로의 행이 여러 개 생기므로
+결과를 읽을 때는 shard 번호 → 행 순서로 정렬해 경로별 마지막 행을 사용해야 합니다.
+"""
+import argparse
+import glob
+import os
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import torch
+from PIL import Image
+from torch.utils.data import DataLoader, Dataset
+
+from efficientnet import IMAGE_SIZE, device, inv_location_map, load_model, predict_batch, problems, transform
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+OUTPUT_SCHEMA = pa.schema([
+    ("path", pa.string()),
+    ("problem", pa.string()),
+    ("location", pa.string()),
+    ("problem_confidence", pa.float32()),
+    ("location_confidence", pa.float32()),
+    ("error", pa.string()),
+])
+
+
+# ------------------------- 입력 목록 ------------------------- #
+def list_images(source):
+    """디렉터리(하위 폴더 포함) 또는 한 줄에 경로 하나인 목록 파일에서 이미지 경로 수집"""
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            for name in files:
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    paths.append(os.path.join(root, name))
+        return sorted(paths)
+
+    with open(source, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def shard_index(shard_path):
+    return int(os.path.basename(shard_path)[len("part-"):-len(".parquet")])
+
+
+def list_shards(output_dir):
+    """저장된 shard 경로를 번호 순으로 반환"""
+    return sorted(glob.glob(os.path.join(output_dir, "part-*.parquet")), key=shard_index)
+
+
+def load_done_paths(output_dir, retry_errors=False):
+    """이미 저장된 shard에서 처리 완료된 경로 수집 (재개용, retry_errors 시 마지막 행이 오류인 경로는 제외)"""
+    latest_error = {}
+    # shard 번호 순으로 읽어 경로별 마지막 행 기준으로 판단
+    for shard in list_shards(output_dir):
+        table = pq.read_table(shard, columns=["path", "error"])
+        latest_error.update(zip(table.column("path").to_pylist(), table.column("error").to_pylist()))
+    return {path for path, error in latest_error.items() if not (retry_errors and error is not None)}
+
+
+# ------------------------- 데이터셋 ------------------------- #
+class ImagePathDataset(Dataset):
+    """DataLoader worker에서 JPEG 디코딩 + transform 수행"""
+
+    def __init__(self, paths):
+        self.paths = paths
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, idx):
+        path = self.paths[idx]
+        try:
+            image = Image.open(path).convert("RGB")
+            return transform(image), path, ""
+        except Exception as e:
+            # 깨진 이미지는 빈 텐서로 대체하고 오류 기록
+            return torch.zeros(3, IMAGE_SIZE, IMAGE_SIZE), path, str(e)
+
+
+def collate(batch):
+    images, paths, errors = zip(*batch)
+    return torch.stack(images), list(paths), list(errors)
+
+
+# ------------------------- 결과 저장 ------------------------- #
+class ShardWriter:
+    """일정 개수마다 parquet shard로 저장 (shard 단위 체크포인트)"""
+
+    def __init__(self, output_dir, shard_size, flush_interval=60):
+        self.output_dir = output_dir
+        self.shard_size = shard_size
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+        # 중간 shard가 삭제되어도 기존 shard를 덮어쓰지 않도록 최대 번호 다음부터 사용
+        indices = [shard_index(shard) for shard in list_shards(output_dir)]
+        self.shard_idx = max(indices, default=-1) + 1
+        self.rows = {name: [] for name in OUTPUT_SCHEMA.names}
+
+    def add(self, path, problem, location, problem_conf, location_conf, error):
+        for name, value in zip(OUTPUT_SCHEMA.names, (path, problem, location, problem_conf, location_conf, error)):
+            self.rows[name].append(value)
+        # 개수 또는 시간 기준으로 체크포인트 저장
+        if len(self.rows["path"]) >= self.shard_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.rows["path"]:
+            return
+        table = pa.Table.from_pydict(self.rows, schema=OUTPUT_SCHEMA)
+        shard_path = os.path.join(self.output_dir, f"part-{self.shard_idx:05d}.parquet")
+        # 임시 파일에 쓴 뒤 이름 변경 → 중단되어도 불완전한 shard가 남지 않음
+        pq.write_table(table, shard_path + ".tmp")
+        os.replace(shard_path + ".tmp", shard_path)
+        self.shard_idx += 1
+        self.rows = {name: [] for name in OUTPUT_SCHEMA.names}
+
+
+# ------------------------- 일괄 분석 ------------------------- #
+def run_bulk(source, output_dir, weight_path="best_model.pt", batch_size=64, num_workers=4, shard_size=2000,
+             retry_errors=False):
+    os.makedirs(output_dir, exist_ok=True)
+
+    paths = list_images(source)
+    done = load_done_paths(output_dir, retry_errors)
+    todo = [path for path in paths if path not in done]
+    print(f"✅ 전체 {len(paths)}장 중 {len(done & set(paths))}장 완료, {len(todo)}장 분석 시작")
+    if not todo:
+        return
+
+    model = load_model(weight_path)
+    loader = DataLoader(
+        ImagePathDataset(todo),
+        batch_size=batch_size,
+        num_workers=num_workers,
+        collate_fn=collate,
+        pin_memory=device.type == "cuda",
+        persistent_workers=num_workers > 0,
+        prefetch_factor=4 if num_workers > 0 else None,
+    )
+    writer = ShardWriter(output_dir, shard_size)
+
+    processed = 0
+    start = time.perf_counter()
+    try:
+        for images, batch_paths, errors in loader:
+            # 디코딩 실패 이미지는 추론에서 제외하고 오류만 기록
+            ok = [i for i, error in enumerate(errors) if not error]
+            for i, path in enumerate(batch_paths):
+                if errors[i]:
+                    writer.add(path, None, None, None, None, errors[i])
+
+            if ok:
+                label_idx, loc_idx, label_conf, loc_conf = predict_batch(model, images[ok])
+                for j, i in enumerate(ok):
+                    writer.add(
+                        batch_paths[i],
+                        problems[label_idx[j].item()],
+                        inv_location_map[loc_idx[j].item()],
+                        label_conf[j].item(),
+                        loc_conf[j].item(),
+                        None,
+                    )
+
+            processed += len(batch_paths)
+            elapsed = time.perf_counter() - start
+            print(f"\r{processed}/{len(todo)}장 처리 ({processed / elapsed:.1f} images/sec)", end="", flush=True)
+    finally:
+        # 중단(Ctrl-C, OOM 등) 시에도 완료된 결과는 저장
+        writer.flush()
+
+    elapsed = time.perf_counter() - start
+    print(f"\n✅ 완료: {processed}장, {elapsed:.1f}초, {processed / elapsed:.1f} images/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="이미지 디렉터리/목록 파일 일괄 분석")
+    parser.add_argument("source", help="이미지 디렉터리 또는 한 줄에 경로 하나인 목록 파일")
+    parser.add_argument("--output", required=True, help="parquet shard를 저장할 디렉터리")
+    parser.add_argument("--weights", default="best_model.pt", help="모델 가중치 경로")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4, help="이미지 디코딩 worker 수")
+    parser.add_argument("--shard-size", type=int, default=2000, help="shard(체크포인트)당 최대 이미지 수")
+    parser.add_argument("--retry-errors", action="store_true", help="디코딩 오류로 기록된 이미지 다시 분석")
+    args = parser.parse_args()
+
+    run_bulk(args.source, args.output, args.weights, args.batch_size, args.workers, args.shard_size, args.retry_errors)
+
+
+if __name__ == "__main__":
+    main()
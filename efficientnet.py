@@ -58,8 +58,16 @@ valid_location_scope = {
     3: [6, 7, 14]  # water_stain
 }
 
+# 문제 유형별 유효 위치 마스크 (배치 마스킹용, [num_labels, num_locations])
+valid_location_mask = torch.tensor([
+    [loc_idx in valid_location_scope[label_idx] for loc_idx in range(len(location_map))]
+    for label_idx in range(len(problems))
+])
+
+IMAGE_SIZE = 456  # efficientnet-b5 입력 해상도
+
 transform = transforms.Compose([
-    transforms.Resize((456, 456), interpolation=InterpolationMode.BILINEAR),
+    transforms.Resize((IMAGE_SIZE, IMAGE_SIZE), interpolation=InterpolationMode.BILINEAR),
     transforms.ToTensor(),
     transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
 ])
@@ -97,6 +105,27 @@ def predict_image(model, image_path_or_pil):
     return pred_label_idx, pred_loc_idx
 
 
+def predict_batch(model, images):
+    """
+    전처리된 이미지 배치 [B, 3, H, W]에 대해 문제 유형/위치를 예측합니다.
+    (문제 인덱스, 위치 인덱스, 문제 확률, 위치 확률) 텐서를 반환합니다.
+    """
+    images = images.to(device, non_blocking=True)
+
+    with torch.inference_mode():
+        label_out, loc_out = model(images)
+
+        label_probs = torch.softmax(label_out, dim=1)
+        label_conf, pred_label_idx = label_probs.max(dim=1)
+
+        # 유효 위치 마스킹
+        valid = valid_location_mask.to(loc_out.device)[pred_label_idx]
+        masked_loc_out = loc_out.masked_fill(~valid, -1e9)
+        loc_conf, pred_loc_idx = torch.softmax(masked_loc_out, dim=1).max(dim=1)
+
+    return pred_label_idx.cpu(), pred_loc_idx.cpu(), label_conf.cpu(), loc_conf.cpu()
+
+
 # ------------------------- 파이프라인 함수 ------------------------- #
 def run_pipeline(image_path_or_pil, model=None):
     if model is None:
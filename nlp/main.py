@@ -2,10 +2,17 @@ from .search import load_search_index, search_documents
 from .generator import generate_answer, generate_contextual_answer
 from .conversation import process_user_message
 import numpy as np
+import os
 from sklearn.preprocessing import normalize
 
 # 서버 시작 시 1회만 로딩
-retriever, index, docs, problem_texts = load_search_index()
+# RETRIEVER_BACKEND: torch(기본) / int8 / onnx / onnx-int8
+# RETRIEVER_MAX_SEQ_LENGTH: 짧은 질의용 토크나이저 최대 길이 (미설정 시 모델 기본값 유지)
+max_seq_length = os.getenv("RETRIEVER_MAX_SEQ_LENGTH")
+retriever, index, docs, problem_texts = load_search_index(
+    backend=os.getenv("RETRIEVER_BACKEND", "torch"),
+    max_seq_length=int(max_seq_length) if max_seq_length else None,
+)
 
 # 이미지 분석 결과로 솔루션 반환
 def return_solution(label: str, loc: str):
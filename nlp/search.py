@@ -1,9 +1,25 @@
+import os
 import re
+import shutil
+import tempfile
 import faiss
 import numpy as np
+import torch
 from sklearn.preprocessing import normalize
 from sentence_transformers import SentenceTransformer
 
+RETRIEVER_MODEL = "jhgan/ko-sroberta-multitask"
+# uvicorn / CLI 실행 위치와 무관하게 같은 캐시를 쓰도록 모듈 기준 경로 사용
+ONNX_EXPORT_DIR = os.getenv(
+    "RETRIEVER_ONNX_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "ko-sroberta-multitask-onnx"),
+)
+ONNX_FP32_FILES = ("onnx/model.onnx", "model.onnx")
+ONNX_INT8_FILE = "onnx/model_qint8_avx2.onnx"
+
+# torch: fp32 원본 / int8: torch 동적 양자화 / onnx: ONNX fp32 / onnx-int8: ONNX 동적 양자화
+RETRIEVER_BACKENDS = ("torch", "int8", "onnx", "onnx-int8")
+
 def extract_problem_only(docs):
     """문서에서 "## 문제:" 항목만 추출"""
     problems = []
@@ -12,17 +28,73 @@ def extract_problem_only(docs):
         problems.append(match.group(1).strip() if match else "")
     return problems
 
-def load_search_index(md_path="homefix.md"):
-    """FAISS 검색 인덱스 로딩"""
-    with open(md_path, "r", encoding="utf-8") as f:
-        markdown_text = f.read()
+def _find_onnx_file(quantize):
+    """export 디렉터리에서 로딩할 .onnx 파일 경로 반환 (없으면 None)"""
+    candidates = (ONNX_INT8_FILE,) if quantize else ONNX_FP32_FILES
+    for file_name in candidates:
+        if os.path.isfile(os.path.join(ONNX_EXPORT_DIR, file_name)):
+            return file_name
+    return None
 
-    sections = markdown_text.split("\n---\n")
-    docs = [section.strip() for section in sections if section.strip()]
+def _export_onnx_retriever(quantize):
+    """ONNX fp32 / int8 모델 export (임시 디렉터리에 쓴 뒤 이름 변경 → 중단되어도 불완전한 캐시가 남지 않음)"""
+    # ONNX 백엔드는 optimum[onnxruntime] 설치 필요
+    from sentence_transformers import export_dynamic_quantized_onnx_model
 
-    retriever = SentenceTransformer("jhgan/ko-sroberta-multitask")
+    # uvicorn worker 여러 개가 동시에 export해도 서로 지우지 않도록 프로세스별 임시 디렉터리 사용
+    parent_dir = os.path.dirname(ONNX_EXPORT_DIR)
+    os.makedirs(parent_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=os.path.basename(ONNX_EXPORT_DIR) + ".", dir=parent_dir)
+    try:
+        model = SentenceTransformer(RETRIEVER_MODEL, device="cpu", backend="onnx")
+        model.save_pretrained(tmp_dir)
+        export_dynamic_quantized_onnx_model(model, "avx2", tmp_dir)
 
-    problem_texts = extract_problem_only(docs)
+        # 다른 프로세스가 먼저 export를 끝냈으면 그 결과 사용
+        if _find_onnx_file(quantize) is not None:
+            return
+        # 이전 버전이 남긴 불완전한 캐시 제거 후 교체
+        shutil.rmtree(ONNX_EXPORT_DIR, ignore_errors=True)
+        try:
+            os.replace(tmp_dir, ONNX_EXPORT_DIR)
+        except OSError:
+            if _find_onnx_file(quantize) is None:
+                raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def _load_onnx_retriever(quantize):
+    """ONNX 인코더 로딩 (최초 1회 export 후 로컬 캐시 사용)"""
+    file_name = _find_onnx_file(quantize)
+    if file_name is None:
+        _export_onnx_retriever(quantize)
+        file_name = _find_onnx_file(quantize)
+    if file_name is None:
+        candidates = (ONNX_INT8_FILE,) if quantize else ONNX_FP32_FILES
+        raise FileNotFoundError(f"ONNX export 후에도 모델 파일을 찾을 수 없음: {ONNX_EXPORT_DIR} ({', '.join(candidates)})")
+
+    return SentenceTransformer(ONNX_EXPORT_DIR, device="cpu", backend="onnx", model_kwargs={"file_name": file_name})
+
+def load_retriever(backend="torch", max_seq_length=None):
+    """임베딩 모델 로딩 (max_seq_length 미지정 시 모델 기본값 유지)"""
+    if backend not in RETRIEVER_BACKENDS:
+        raise ValueError(f"지원하지 않는 검색 백엔드: {backend} (가능: {', '.join(RETRIEVER_BACKENDS)})")
+
+    if backend in ("onnx", "onnx-int8"):
+        retriever = _load_onnx_retriever(quantize=backend == "onnx-int8")
+    elif backend == "int8":
+        # 동적 int8 양자화는 CPU 전용
+        retriever = SentenceTransformer(RETRIEVER_MODEL, device="cpu")
+        retriever = torch.ao.quantization.quantize_dynamic(retriever, {torch.nn.Linear}, dtype=torch.qint8)
+    else:
+        retriever = SentenceTransformer(RETRIEVER_MODEL)
+
+    if max_seq_length:
+        retriever.max_seq_length = max_seq_length
+    return retriever
+
+def build_index(retriever, problem_texts):
+    """문제 항목 임베딩으로 FAISS 인덱스 생성"""
     problem_embeddings = retriever.encode(problem_texts, convert_to_tensor=False)
     problem_embeddings = np.array(problem_embeddings).astype("float32")
     problem_embeddings = normalize(problem_embeddings, norm='l2')
@@ -30,6 +102,20 @@ def load_search_index(md_path="homefix.md"):
     dim = problem_embeddings.shape[1]
     index = faiss.IndexFlatL2(dim)
     index.add(problem_embeddings)
+    return index
+
+def load_search_index(md_path="homefix.md", backend="torch", max_seq_length=None):
+    """FAISS 검색 인덱스 로딩"""
+    with open(md_path, "r", encoding="utf-8") as f:
+        markdown_text = f.read()
+
+    sections = markdown_text.split("\n---\n")
+    docs = [section.strip() for section in sections if section.strip()]
+
+    retriever = load_retriever(backend, max_seq_length)
+
+    problem_texts = extract_problem_only(docs)
+    index = build_index(retriever, problem_texts)
 
     return retriever, index, docs, problem_texts
 
@@ -48,3 +134,26 @@ def search_documents(query: str, retriever, index, docs, k=5):
     ]
 
     return filtered_docs
+
+def verify_retrieval(backend, md_path="homefix.md", queries=None, k=5, max_seq_length=None):
+    """
+    backend 인코더(max_seq_length 적용)의 검색 결과가 fp32 원본 모델과 같은지 확인합니다.
+    queries 미지정 시 문서의 "## 문제:" 항목과 이미지 분석용 질문 형식을 사용합니다.
+    결과가 다른 (질문, fp32 결과, backend 결과) 목록을 반환합니다.
+    """
+    reference, reference_index, docs, problem_texts = load_search_index(md_path, backend="torch", max_seq_length=None)
+    candidate, candidate_index, _, _ = load_search_index(md_path, backend=backend, max_seq_length=max_seq_length)
+
+    if queries is None:
+        queries = [text for text in problem_texts if text]
+        queries += [f"{text}에서 제거하는 법 알려줘." for text in queries]
+
+    mismatches = []
+    for query in queries:
+        expected = search_documents(query, reference, reference_index, docs, k=k)
+        actual = search_documents(query, candidate, candidate_index, docs, k=k)
+        if expected != actual:
+            mismatches.append((query, expected, actual))
+
+    print(f"✅ {backend}: {len(queries) - len(mismatches)}/{len(queries)} 질문의 검색 결과가 fp32와 일치")
+    return mismatches